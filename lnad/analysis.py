@@ -12,83 +12,219 @@ import numpy as np
 import pandas as pd
 import operator
 import pathlib
+import csv
+import os
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
 
+try:
+    import numba
+except ImportError:  # numba is optional
+    numba = None
 
-def degree_centrality(G, weight=None):
-    """Compute degree centrality for the nodes."""
-    centrality = {G.vs[idx]: d / (G.vcount() - 1) for idx, d in enumerate(G.degree())}
+
+def to_sorted_dict(values):
+    """Return dict with centralities keyed by index and sorted in descending order."""
+    centrality = {idx: d for idx, d in enumerate(np.asarray(values).tolist())}
     centrality = dict(
         sorted(centrality.items(), key=operator.itemgetter(1), reverse=True)
     )
     return centrality
 
 
+def degree_centrality(G, weight=None):
+    """Compute degree centrality for the nodes, indexed by node id."""
+    return np.asarray(G.degree(), dtype=np.float64) / (G.vcount() - 1)
+
+
 def eigenvector_centrality(G, weight=None):
-    """Compute eigenvector centrality for the nodes."""
-    centrality = {
-        G.vs[idx]: d
-        for idx, d in enumerate(
-            G.eigenvector_centrality(directed=G.is_directed(), weights=weight, scale=False)
-        )
-    }
-    centrality = dict(
-        sorted(centrality.items(), key=operator.itemgetter(1), reverse=True)
+    """Compute eigenvector centrality for the nodes, indexed by node id."""
+    return np.asarray(
+        G.eigenvector_centrality(directed=G.is_directed(), weights=weight, scale=False)
     )
-    return centrality
 
 
-def betweenness_centrality(G, weight=None):
-    """Compute betweenness centrality for the nodes."""
+def _betweenness_normalization(G):
+    """Return normalization constant for betweenness centrality of the nodes."""
     if G.is_directed():
-        normalize = 1 / ((G.vcount() - 1) * (G.vcount() - 2))
+        return 1 / ((G.vcount() - 1) * (G.vcount() - 2))
     else:
-        normalize = 2 / ((G.vcount() - 1) * (G.vcount() - 2))
-    centrality = {
-        G.vs[idx]: d * normalize
-        for idx, d in enumerate(G.betweenness(directed=G.is_directed(), weights=weight))
-    }
-    centrality = dict(
-        sorted(centrality.items(), key=operator.itemgetter(1), reverse=True)
+        return 2 / ((G.vcount() - 1) * (G.vcount() - 2))
+
+
+def betweenness_centrality(G, weight=None, normalize=True):
+    """Compute betweenness centrality for the nodes, indexed by node id.
+
+    If normalize is false, the centralities are not divided by the number of
+    pairs of nodes.
+    """
+    bc = np.asarray(G.betweenness(directed=G.is_directed(), weights=weight))
+    if normalize:
+        bc = np.multiply(bc, _betweenness_normalization(G))
+    return bc
+
+
+def _pivots(G, k, seed=None):
+    """Return random sample of k pivot nodes."""
+    rng = np.random.default_rng(seed)
+    return rng.choice(G.vcount(), size=k, replace=False).tolist()
+
+
+def betweenness_centrality_sampled(G, weight=None, k=64, seed=None, normalize=True):
+    """Estimate betweenness centrality for the nodes from k random pivot nodes.
+
+    The centralities are indexed by node id. If normalize is false, the
+    centralities are not divided by the number of pairs of nodes.
+
+    Reference:
+        Brandes, U., and Pich, C. (2007). Centrality estimation in large
+        networks. Int J Bifurcation Chaos 17, 2303-2318.
+    """
+    if k >= G.vcount():
+        return betweenness_centrality(G, weight, normalize)
+    # dependencies accumulated from the pivots are extrapolated to all sources
+    scale = G.vcount() / k
+    if normalize:
+        scale *= _betweenness_normalization(G)
+    bc = G.betweenness(
+        directed=G.is_directed(), weights=weight, sources=_pivots(G, k, seed)
     )
-    return centrality
+    return np.multiply(bc, scale)
 
 
-def edge_betweenness_centrality(G, weight=None):
-    """Compute betweenness centrality for the edges."""
+def _edge_betweenness_normalization(G):
+    """Return normalization constant for betweenness centrality of the edges."""
     if G.is_directed():
-        normalize = 1 / (G.vcount() * (G.vcount() - 1))
+        return 1 / (G.vcount() * (G.vcount() - 1))
     else:
-        normalize = 2 / (G.vcount() * (G.vcount() - 1))
-    centrality = {
-        G.es[idx]: d * normalize
-        for idx, d in enumerate(
-            G.edge_betweenness(directed=G.is_directed(), weights=weight)
-        )
-    }
-    centrality = dict(
-        sorted(centrality.items(), key=operator.itemgetter(1), reverse=True)
+        return 2 / (G.vcount() * (G.vcount() - 1))
+
+
+def edge_betweenness_centrality(G, weight=None, normalize=True):
+    """Compute betweenness centrality for the edges, indexed by edge id.
+
+    If normalize is false, the centralities are not divided by the number of
+    pairs of nodes.
+    """
+    bc = np.asarray(G.edge_betweenness(directed=G.is_directed(), weights=weight))
+    if normalize:
+        bc = np.multiply(bc, _edge_betweenness_normalization(G))
+    return bc
+
+
+def edge_betweenness_centrality_sampled(
+    G, weight=None, k=64, seed=None, normalize=True
+):
+    """Estimate betweenness centrality for the edges from k random pivot nodes.
+
+    The centralities are indexed by edge id. If normalize is false, the
+    centralities are not divided by the number of pairs of nodes.
+
+    Reference:
+        Brandes, U., and Pich, C. (2007). Centrality estimation in large
+        networks. Int J Bifurcation Chaos 17, 2303-2318.
+    """
+    if k >= G.vcount():
+        return edge_betweenness_centrality(G, weight, normalize)
+    # dependencies accumulated from the pivots are extrapolated to all sources
+    scale = G.vcount() / k
+    if normalize:
+        scale *= _edge_betweenness_normalization(G)
+    bc = G.edge_betweenness(
+        directed=G.is_directed(), weights=weight, sources=_pivots(G, k, seed)
     )
-    return centrality
+    return np.multiply(bc, scale)
 
 
 def closeness_centrality(G, weight=None):
-    """Compute closeness centrality for the nodes."""
-    centrality = {G.vs[idx]: d for idx, d in enumerate(G.closeness(weights=weight))}
-    centrality = dict(
-        sorted(centrality.items(), key=operator.itemgetter(1), reverse=True)
-    )
-    return centrality
+    """Compute closeness centrality for the nodes, indexed by node id."""
+    return np.asarray(G.closeness(weights=weight))
 
 
 def pagerank(G, weight=None):
-    """Compute PageRank for the nodes."""
-    rank = {
-        G.vs[idx]: d
-        for idx, d in enumerate(G.pagerank(directed=G.is_directed(), weights=weight))
-    }
-    rank = dict(sorted(rank.items(), key=operator.itemgetter(1), reverse=True))
-    return rank
+    """Compute PageRank for the nodes, indexed by node id."""
+    if weight is None:
+        return np.asarray(G.pagerank(directed=G.is_directed()))
+    return np.asarray(G.pagerank(directed=G.is_directed(), weights=weight))
+
+
+# normalization constants for the measures where it can be applied after ranking
+_centrality_normalization = {
+    betweenness_centrality: _betweenness_normalization,
+    betweenness_centrality_sampled: _betweenness_normalization,
+    edge_betweenness_centrality: _edge_betweenness_normalization,
+    edge_betweenness_centrality_sampled: _edge_betweenness_normalization,
+}
+
+
+def _networkit():
+    """Return the networkit module, which is slow to import and only loaded if used."""
+    try:
+        import networkit
+    except ImportError:  # networkit is optional
+        raise ImportError("networkit is required for the networkit backend") from None
+    return networkit
+
+
+def _to_networkit(G, weight=None, directed=None):
+    """Return copy of the graph as a networkit graph with the same node ids."""
+    nk = _networkit()
+    if directed is None:
+        directed = G.is_directed()
+    Gk = nk.Graph(G.vcount(), weighted=weight is not None, directed=directed)
+    if G.ecount() > 0:
+        sources, targets = np.array(G.get_edgelist(), dtype=np.uint64).transpose()
+        if weight is None:
+            w = np.ones(G.ecount())
+        else:
+            w = np.asarray(G.es[weight], dtype=np.float64)
+        Gk.addEdges(
+            (w, (np.ascontiguousarray(sources), np.ascontiguousarray(targets)))
+        )
+    return Gk
+
+
+def _networkit_betweenness(G, Gk, normalize=True):
+    """Compute betweenness centrality for the nodes with networkit."""
+    nk = _networkit()
+    bc = np.asarray(nk.centrality.Betweenness(Gk).run().scores())
+    if not G.is_directed():
+        bc /= 2  # networkit counts each pair of nodes in both directions
+    if normalize:
+        bc = np.multiply(bc, _betweenness_normalization(G))
+    return bc
+
+
+def _networkit_closeness(G, Gk):
+    """Compute closeness centrality for the nodes with networkit.
+
+    Gk must be undirected, since igraph ignores the direction of the edges.
+    """
+    nk = _networkit()
+    cc = nk.centrality.Closeness(Gk, False, nk.centrality.ClosenessVariant.GENERALIZED)
+    cc = np.asarray(cc.run().scores())
+    # networkit scales the closeness by the fraction of nodes that are reached,
+    # while igraph only considers the reachable nodes
+    components = G.connected_components(mode="weak")
+    reached = np.asarray(components.sizes())[components.membership]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cc = cc * (G.vcount() - 1) / (reached - 1)
+    cc[reached == 1] = np.nan
+    return cc
+
+
+def _networkit_pagerank(Gk):
+    """Compute PageRank for the nodes with networkit."""
+    nk = _networkit()
+    pr = nk.centrality.PageRank(
+        Gk, tol=1e-12, distributeSinks=nk.centrality.SinkHandling.DistributeSinks
+    )
+    pr = np.asarray(pr.run().scores())
+    # sinks are only distributed in directed graphs, hence isolated nodes of
+    # undirected graphs leak probability mass
+    return pr / pr.sum()
 
 
 def articulation_points(G):
@@ -115,9 +251,127 @@ def second_largest_connected_component(G):
         return 0
 
 
-def global_efficiency(G, weight=None):
+# smallest number of source nodes for which shortest paths are computed in
+# parallel, the cost of sending the graph and the rows between the processes is
+# then about 20 % of the serial time
+_PARALLEL_MIN_SOURCES = 200
+
+# smallest number of source nodes times nodes and edges for which the processes
+# are started; starting them takes a few seconds, which two processes recover
+# from about 10**8 steps of breadth-first search
+_PARALLEL_MIN_WORK = 10**8
+
+# pool of processes reused between calls as (number of processes, executor)
+_process_pool = None
+
+
+def _distance_dtype(weight=None):
+    """Return data type used for storing shortest path lengths."""
+    if weight is None:
+        # hop counts from breadth-first search are exact in single precision
+        return np.float32
+    else:
+        return np.float64
+
+
+def _distances(G, sources=None, weight=None):
+    return np.asarray(
+        G.distances(source=sources, weights=weight, mode="all"),
+        dtype=_distance_dtype(weight),
+    )
+
+
+def _executor(n_jobs):
+    """Return pool with n_jobs processes, which is started once and then reused."""
+    global _process_pool
+    if _process_pool is None or _process_pool[0] != n_jobs:
+        if _process_pool is not None:
+            _process_pool[1].shutdown()
+        # igraph does not release the GIL, hence processes are used instead of
+        # threads; the processes are spawned since forking after numba has started
+        # its thread pool may deadlock
+        context = multiprocessing.get_context("spawn")
+        executor = ProcessPoolExecutor(max_workers=n_jobs, mp_context=context)
+        _process_pool = (n_jobs, executor)
+    return _process_pool[1]
+
+
+def distance_matrix(G, weight=None, n_jobs=None, sources=None):
+    """Return matrix with shortest path lengths between all pairs of nodes.
+
+    Arguments:
+        weight: If weight is not none, use weighted shortest paths
+        n_jobs: Number of processes used for computing the shortest paths from
+            chunks of source nodes in parallel (-1 means using all processors);
+            the processes are only started for large graphs and then kept for
+            later calls
+        sources: If sources is not none, only return the rows for these nodes
+    """
+    if sources is None:
+        sources = list(range(G.vcount()))
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    if n_jobs is None or n_jobs < 2 or len(sources) < _PARALLEL_MIN_SOURCES:
+        return _distances(G, sources, weight)
+    started = _process_pool is not None and _process_pool[0] == n_jobs
+    if not started and len(sources) * (G.vcount() + G.ecount()) < _PARALLEL_MIN_WORK:
+        return _distances(G, sources, weight)
+    chunks = [chunk.tolist() for chunk in np.array_split(sources, n_jobs)]
+    D = _executor(n_jobs).map(
+        _distances, itertools.repeat(G), chunks, itertools.repeat(weight)
+    )
+    return np.vstack(list(D))
+
+
+def _inverse_distance_sum(D):
+    """Return sum of inverse shortest path lengths."""
+    # zero-length and infinite paths do not contribute
+    mask = np.isfinite(D) & (D > 0)
+    return np.reciprocal(D, out=np.zeros(D.shape), where=mask, dtype=np.float64).sum()
+
+
+if numba is not None:
+    # mask, reciprocal and sum fused into a single pass over the matrix, only
+    # reassociation is allowed since infinite path lengths must be kept; each
+    # element is read once, hence the rows are streamed in memory order rather
+    # than processed in cache blocks
+    @numba.njit(parallel=True, fastmath={"reassoc"}, cache=True)
+    def _inverse_distance_sum(D):
+        n, m = D.shape
+        inv_sum = 0.0
+        for i in numba.prange(n):
+            for j in range(m):
+                d = D[i, j]
+                if d > 0 and d < np.inf:
+                    inv_sum += 1.0 / d
+        return inv_sum
+
+
+def efficiency_from_distances(D, n=None):
+    """Return global efficiency from a matrix with shortest path lengths.
+
+    Arguments:
+        D: Matrix with shortest path lengths between pairs of nodes
+        n: Number of nodes in the network (default is the size of D)
+    """
+    D = np.asarray(D)
+    if not np.issubdtype(D.dtype, np.floating):
+        D = D.astype(np.float64)
+    if n is None:
+        n = len(D)
+    if n < 2:
+        return 0
+    return _inverse_distance_sum(D) / (n * (n - 1))
+
+
+def global_efficiency(G, weight=None, n_jobs=None):
     """Return global efficiency of the network.
 
+    Arguments:
+        weight: If weight is not none, use weighted shortest paths
+        n_jobs: Number of processes used for computing the shortest paths
+            (-1 means using all processors)
+
     Reference:
         - Latora, V., and Marchiori, M. (2001). Efficient behavior of
           small-world networks. Physical Review Letters 87.
@@ -127,25 +381,73 @@ def global_efficiency(G, weight=None):
           analysis of link removal strategies in real complex weighted networks.
           Sci Rep 10, 3911 (2020). https://doi.org/10.1038/s41598-020-60298-7
     """
-    n = G.vcount()
-    if n < 2:
-        eff = 0
-    else:
-        inv_d = []
-        for v in G.vs:
-            dij = G.distances(v, weights=weight, mode="all")[0]
-            inv_dij = [1 / d for d in dij if not (d == 0 or np.isinf(d))]
-            inv_d.extend(inv_dij)
-        eff = sum(inv_d) / (n * (n - 1))
-    return eff
+    if G.vcount() < 2:
+        return 0
+    return efficiency_from_distances(distance_matrix(G, weight, n_jobs))
+
+
+def _read_edges(
+    filename, comments="#", delimiter=None, nodetype=None, data=True, encoding="utf-8"
+):
+    """Read list of edges into a data frame, return None if the format is unsupported."""
+    if len(comments) != 1:
+        return None
+    keys = [] if isinstance(data, bool) else [key for key, _ in data]
+    try:
+        edges = pd.read_csv(
+            filename,
+            sep=delimiter if delimiter else r"\s+",
+            comment=comments,
+            header=None,
+            dtype=str,
+            encoding=encoding,
+            usecols=[0, 1] if data is False else None,
+        )
+    except ValueError:
+        return None
+    if edges.shape[1] != 2 + len(keys) or edges.isna().any(axis=None):
+        return None  # edge data must be parsed by NetworkX
+    edges.columns = ["source", "target"] + keys
+    if nodetype:
+        edges["source"] = edges["source"].map(nodetype)
+        edges["target"] = edges["target"].map(nodetype)
+    if not isinstance(data, bool):
+        for key, edge_type in data:
+            edges[key] = edges[key].map(edge_type)
+    return edges
 
 
 class NetworkAnalysis:
     """Class for doing network analysis on graphs."""
-    def __init__(self, G=None):
+    def __init__(self, G=None, backend="igraph"):
+        """Initialize network analysis.
+
+        Arguments:
+            G: Graph to be analysed
+            backend: Library used for the betweenness and closeness centrality and
+                PageRank of the nodes, either igraph or networkit (optional, runs
+                in parallel); the graph is converted to networkit when first
+                needed, hence changes made to the graph in place are not seen
+        """
+        if backend not in ("igraph", "networkit"):
+            raise ValueError(f"unknown backend: {backend}")
+        if backend == "networkit":
+            _networkit()
+        self.backend = backend
         self.graph = None
         if G and isinstance(G, ig.Graph):
             self.graph = G
+        self._networkit_graphs = (None, {})
+
+    def _networkit_graph(self, weight=None, directed=None):
+        """Return the graph converted to networkit, cached until it is replaced."""
+        graph, converted = self._networkit_graphs
+        if graph is not self.graph:
+            converted = {}
+            self._networkit_graphs = (self.graph, converted)
+        if (weight, directed) not in converted:
+            converted[(weight, directed)] = _to_networkit(self.graph, weight, directed)
+        return converted[(weight, directed)]
 
     def read(self, filename, format=None):
         """Read a graph from file."""
@@ -162,28 +464,67 @@ class NetworkAnalysis:
         encoding="utf-8",
     ):
         """Read a graph from a list of edges."""
-        # NetworkX is used to read the data and then the graph is converted to igraph
-        G = nx.read_edgelist(
-            filename,
-            comments=comments,
-            delimiter=delimiter,
-            create_using=create_using,
-            nodetype=nodetype,
-            data=data,
-            encoding=encoding,
-        )
-        self.graph = ig.Graph.from_networkx(G)
-        self.graph.vs["name"] = self.graph.vs["_nx_name"]
+        G = nx.empty_graph(0, create_using)
+        edges = _read_edges(filename, comments, delimiter, nodetype, data, encoding)
+        if edges is not None:
+            # the vertex names are factorized here since igraph.Graph.DataFrame
+            # converts integer names to floats when there are numeric edge data
+            vids, names = pd.factorize(edges[["source", "target"]].values.ravel())
+            self.graph = ig.Graph(
+                n=len(names),
+                edges=vids.reshape(-1, 2).tolist(),
+                directed=G.is_directed(),
+            )
+            self.graph.vs["name"] = names.tolist()
+            for key in edges.columns[2:]:
+                self.graph.es[key] = edges[key].tolist()
+            if not G.is_multigraph():
+                self.graph.simplify(multiple=True, loops=False, combine_edges="last")
+        else:
+            # NetworkX is used to parse arbitrary edge data and then the graph is
+            # converted to igraph
+            G = nx.read_edgelist(
+                filename,
+                comments=comments,
+                delimiter=delimiter,
+                create_using=create_using,
+                nodetype=nodetype,
+                data=data,
+                encoding=encoding,
+            )
+            self.graph = ig.Graph.from_networkx(G)
+            self.graph.vs["name"] = self.graph.vs["_nx_name"]
 
     def read_adjacency(self, filename, index_col=0, create_using=nx.Graph):
         """Load network from CSV file with interdependency matrix."""
-        # NetworkX is used to read the data and then the graph is converted to igraph
         if pathlib.Path(filename).suffix == ".csv":
-            df = pd.read_csv(filename, index_col=index_col)
+            with open(filename, newline="") as f:
+                header = next(csv.reader(f))
+            if isinstance(index_col, str):
+                # labels are resolved to positions as by pandas.read_csv
+                if index_col not in header:
+                    raise ValueError(f"index column not found: {index_col}")
+                index_col = header.index(index_col)
+            elif index_col is not None and not isinstance(index_col, int):
+                raise ValueError("index_col must be a column position or label")
+            usecols = [i for i in range(len(header)) if i != index_col]
+            A = np.loadtxt(
+                filename, delimiter=",", skiprows=1, usecols=usecols, ndmin=2
+            )
             # need to make sure dependency is interpreted as j --> i
-            G = nx.from_pandas_adjacency(df.transpose(), create_using=create_using)
-            self.graph = ig.Graph.from_networkx(G)
-            self.graph.vs["name"] = self.graph.vs["_nx_name"]
+            A = A.transpose()
+            directed = nx.empty_graph(0, create_using).is_directed()
+            if not directed:
+                A = np.triu(np.maximum(A, A.transpose()))
+            # the graph is built from the nonzero entries only
+            sources, targets = np.nonzero(A)
+            self.graph = ig.Graph(
+                n=len(usecols),
+                edges=list(zip(sources.tolist(), targets.tolist())),
+                directed=directed,
+            )
+            self.graph.es["weight"] = A[sources, targets].tolist()
+            self.graph.vs["name"] = [header[i] for i in usecols]
         else:
             self.graph = None
 
@@ -192,22 +533,52 @@ class NetworkAnalysis:
         self.graph.write_gml(filename)
 
     def degree_centrality(self):
-        return degree_centrality(self.graph)
+        return to_sorted_dict(degree_centrality(self.graph))
 
     def eigenvector_centrality(self, weight=None):
-        return eigenvector_centrality(self.graph, weight=weight)
+        return to_sorted_dict(eigenvector_centrality(self.graph, weight=weight))
+
+    def betweenness_centrality(self, weight=None, normalize=True):
+        if self.backend == "networkit":
+            Gk = self._networkit_graph(weight)
+            return to_sorted_dict(_networkit_betweenness(self.graph, Gk, normalize))
+        return to_sorted_dict(
+            betweenness_centrality(self.graph, weight=weight, normalize=normalize)
+        )
 
-    def betweenness_centrality(self, weight=None):
-        return betweenness_centrality(self.graph, weight=weight)
+    def betweenness_centrality_sampled(
+        self, weight=None, k=64, seed=None, normalize=True
+    ):
+        return to_sorted_dict(
+            betweenness_centrality_sampled(
+                self.graph, weight=weight, k=k, seed=seed, normalize=normalize
+            )
+        )
+
+    def edge_betweenness_centrality(self, weight=None, normalize=True):
+        return to_sorted_dict(
+            edge_betweenness_centrality(self.graph, weight=weight, normalize=normalize)
+        )
 
-    def edge_betweenness_centrality(self, weight=None):
-        return edge_betweenness_centrality(self.graph, weight=weight)
+    def edge_betweenness_centrality_sampled(
+        self, weight=None, k=64, seed=None, normalize=True
+    ):
+        return to_sorted_dict(
+            edge_betweenness_centrality_sampled(
+                self.graph, weight=weight, k=k, seed=seed, normalize=normalize
+            )
+        )
 
     def closeness_centrality(self, distance=None):
-        return closeness_centrality(self.graph, weight=distance)
+        if self.backend == "networkit":
+            Gk = self._networkit_graph(distance, directed=False)
+            return to_sorted_dict(_networkit_closeness(self.graph, Gk))
+        return to_sorted_dict(closeness_centrality(self.graph, weight=distance))
 
     def pagerank(self, weight=None):
-        return pagerank(self.graph, weight=None)
+        if self.backend == "networkit":
+            return to_sorted_dict(_networkit_pagerank(self._networkit_graph(weight)))
+        return to_sorted_dict(pagerank(self.graph, weight=weight))
 
     def articulation_points(self):
         return articulation_points(self.graph)
@@ -221,8 +592,8 @@ class NetworkAnalysis:
     def second_largest_connected_component(self):
         return second_largest_connected_component(self.graph)
 
-    def global_efficiency(self, weight=None):
-        return global_efficiency(self.graph, weight=weight)
+    def global_efficiency(self, weight=None, n_jobs=None):
+        return global_efficiency(self.graph, weight=weight, n_jobs=n_jobs)
 
     def plot(self, **visual_style):
         ig.plot(self.graph, **visual_style)
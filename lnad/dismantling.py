@@ -6,9 +6,9 @@
 
 """Provides methods for network dismantling."""
 
-import copy
 import numpy as np
 import random as rd
+import itertools
 import matplotlib.pyplot as plt
 import lnad.analysis as lnad
 
@@ -32,7 +32,7 @@ def plot_attack_results(
     ax.fill_between(
         nattacks,
         E_random_avg - E_random_std,
-        np.clip(E_random_avg + E_random_std, a_min=0.0, a_max=1.0),
+        np.minimum(E_random_avg + E_random_std, 1.0),
         alpha=0.2,
         color="gray",
     )
@@ -51,16 +51,168 @@ def plot_attack_results(
     return ax
 
 
+def _lcc_slcc_eff(G, weight=None, D=None):
+    """Return sizes of the two largest connected components and the global efficiency.
+
+    The components are found in a single pass. If no matrix with shortest path
+    lengths is given, the efficiency is computed within each component since
+    pairs of nodes in different components do not contribute.
+    """
+    cc = G.connected_components()
+    sizes = sorted(cc.sizes(), reverse=True) + [0, 0]
+    if D is not None:
+        eff = lnad.efficiency_from_distances(D)
+    else:
+        if G.is_directed():
+            cc = G.connected_components(mode="weak")
+        eff = 0
+        for nodes in cc:
+            if len(nodes) > 1:
+                Dc = G.distances(source=nodes, target=nodes, weights=weight, mode="all")
+                eff += lnad.efficiency_from_distances(Dc, G.vcount())
+    return sizes[0], sizes[1], eff
+
+
+def _edge_lengths(edges, weight=None):
+    """Return lengths of the edges used for shortest paths."""
+    if weight is None:
+        return np.ones(len(edges))
+    return np.asarray(edges[weight], dtype=np.float64)
+
+
+def _tight(D_through, D_target, rtol=1e-9):
+    """Return true where a path through a neighbour node is a shortest path."""
+    # shortest path lengths satisfy the triangle inequality, hence only
+    # allow for round-off errors when testing for equality
+    return np.isfinite(D_through) & (D_through <= D_target * (1.0 + rtol))
+
+
+def _affected_sources(G, D, edges, vertices=(), weight=None):
+    """Return mask with sources whose shortest path lengths change if edges are deleted.
+
+    For positive edge lengths, the shortest path lengths from a source only
+    change if an endpoint of a deleted edge is reached on shortest paths through
+    deleted edges alone. With zero-length edges, all sources with a shortest
+    path through a deleted edge are marked as affected.
+    """
+    edges = set(edges)
+    positive = weight is None or G.ecount() == 0 or min(G.es[weight]) > 0
+    boundary = {x for e in G.es[list(edges)] for x in e.tuple} - set(vertices)
+    affected = np.zeros(len(D), dtype=bool)
+    for x in boundary:
+        through_deleted = np.zeros(len(D), dtype=bool)
+        through_other = np.zeros(len(D), dtype=bool)
+        incident = G.es[G.incident(x, mode="all")]
+        for e, length in zip(incident, _edge_lengths(incident, weight)):
+            y = e.target if e.source == x else e.source
+            if y == x:
+                continue
+            tight = _tight(D[:, y] + length, D[:, x])
+            if e.index in edges:
+                through_deleted |= tight
+            else:
+                through_other |= tight
+        if positive:
+            affected |= through_deleted & ~through_other
+        else:
+            affected |= through_deleted
+    return affected
+
+
+def _update_distances(G, D, sources, weight=None, n_jobs=None):
+    """Recompute shortest path lengths from the given sources."""
+    sources = np.flatnonzero(sources)
+    if len(sources) > 0:
+        Ds = lnad.distance_matrix(G, weight, n_jobs, sources.tolist())
+        D[sources, :] = Ds
+        D[:, sources] = Ds.T
+    return D
+
+
+def _delete_vertices(G, D, vertices, weight=None, n_jobs=None):
+    """Delete vertices from graph and update the matrix with shortest path lengths."""
+    vertices = [int(v) for v in vertices]
+    edges = {e for v in vertices for e in G.incident(v, mode="all")}
+    affected = _affected_sources(G, D, edges, vertices, weight)
+    keep = np.ones(len(D), dtype=bool)
+    keep[vertices] = False
+    G.delete_vertices(vertices)
+    return _update_distances(
+        G, D[np.ix_(keep, keep)], affected[keep], weight, n_jobs
+    )
+
+
+def _delete_edges(G, D, edges, weight=None, n_jobs=None):
+    """Delete edges from graph and update the matrix with shortest path lengths."""
+    edges = [int(e) for e in edges]
+    affected = _affected_sources(G, D, edges, weight=weight)
+    G.delete_edges(edges)
+    return _update_distances(G, D, affected, weight, n_jobs)
+
+
+def _top_centralities(values, k=1):
+    """Return indices and values of the k largest centralities in descending order."""
+    values = np.asarray(values)
+    ranking = np.nan_to_num(values, nan=-np.inf)
+    if k == 1:
+        idx = np.array([np.argmax(ranking)])
+    else:
+        if k < len(values):
+            # all nodes tied with the k-th largest centrality are candidates, so that
+            # ties are broken by index as in the sorted dicts
+            kth = ranking[np.argpartition(-ranking, k - 1)[k - 1]]
+            idx = np.flatnonzero(ranking >= kth)
+        else:
+            idx = np.arange(len(values))
+        idx = idx[np.argsort(-ranking[idx], kind="stable")][:k]
+    return idx.tolist(), values[idx].tolist()
+
+
+def _most_central(G, centrality_method, weight=None, k=1, **kwargs):
+    """Return indices and centralities of the k most central nodes or edges.
+
+    Additional keyword arguments are passed on to the centrality method.
+    """
+    normalization = lnad._centrality_normalization.get(centrality_method)
+    if normalization:
+        # ranking is scale invariant, hence only the largest centralities are normalized
+        idx, values = _top_centralities(
+            centrality_method(G, weight, normalize=False, **kwargs), k
+        )
+        return idx, [value * normalization(G) for value in values]
+    bc = centrality_method(G, weight, **kwargs)
+    if isinstance(bc, dict):
+        # custom measures may return dicts sorted in descending order, keyed by
+        # indices or igraph nodes or edges
+        keys = list(itertools.islice(bc, k))
+        return [getattr(key, "index", key) for key in keys], [bc[key] for key in keys]
+    return _top_centralities(bc, k)
+
+
+def _pivot_rng(seed=None):
+    """Return random number generator for sampling pivot nodes."""
+    if seed is None:
+        seed = rd.getrandbits(64)
+    return np.random.default_rng(seed)
+
+
 class NetworkDismantling:
     """Class for carrying out network dismantling."""
     def __init__(self, G):
         self.graph = G
 
     def get_graph(self):
-        return copy.deepcopy(self.graph)
+        return self.graph.copy()
 
     def node_iterative_centrality_attack(
-        self, nattacks=1, weight=None, centrality_method=lnad.betweenness_centrality
+        self,
+        nattacks=1,
+        weight=None,
+        centrality_method=lnad.betweenness_centrality,
+        approx=False,
+        batch_size=1,
+        n_jobs=None,
+        seed=None,
     ):
         """Carry out iterative targeted attack on nodes.
 
@@ -68,6 +220,15 @@ class NetworkDismantling:
             nattacks: Number of attacks to be carried out
             weight: If weight is not none, use weighted centrality and efficiency measures
             centrality_method: Measure used for assessing the centrality of the nodes
+            approx: If approx is true, estimate betweenness centrality from a random
+                sample of pivot nodes
+            batch_size: Number of most central nodes removed together before the
+                centralities are recomputed; the connected components and efficiency
+                are reported once per batch
+            n_jobs: Number of processes used for updating the shortest paths of large
+                networks (-1 means using all processors)
+            seed: Seed for sampling the pivot nodes if approx is true (by default it
+                is drawn from the random module, as for the random attacks)
 
         Reference:
             Petter Holme, Beom Jun Kim, Chang No Yoon, and Seung Kee Han
@@ -77,25 +238,35 @@ class NetworkDismantling:
             nattacks = 1
         if nattacks > self.graph.vcount():
             nattacks = self.graph.vcount()
+        options = {}
+        if approx:
+            if centrality_method is not lnad.betweenness_centrality:
+                raise ValueError("approx is only supported for betweenness centrality")
+            centrality_method = lnad.betweenness_centrality_sampled
+            options["seed"] = _pivot_rng(seed)
+        if batch_size < 1:
+            batch_size = 1
 
         graph_attacked = self.get_graph()  # work on a local copy of the network
         nodes_attacked = []  # list with coordinates of attacked nodes
         centrality = []  # list with centralities of attacked nodes
 
-        lcc = [lnad.largest_connected_component(graph_attacked)]
-        slcc = [lnad.second_largest_connected_component(graph_attacked)]
-        eff = [lnad.global_efficiency(graph_attacked, weight)]
+        # shortest path lengths are cached and updated after each attack
+        D = lnad.distance_matrix(graph_attacked, weight, n_jobs)
 
-        for _ in range(nattacks):
-            bc = centrality_method(graph_attacked, weight)
-            node = list(bc.keys())[0]
-            nodes_attacked.append(node["name"])
-            graph_attacked.delete_vertices(node)
-            lcc.append(lnad.largest_connected_component(graph_attacked))
-            slcc.append(lnad.second_largest_connected_component(graph_attacked))
-            eff.append(lnad.global_efficiency(graph_attacked, weight))
-            centrality.append(list(bc.values())[0])
+        measures = [_lcc_slcc_eff(graph_attacked, weight, D)]
 
+        while len(nodes_attacked) < nattacks:
+            k = min(batch_size, nattacks - len(nodes_attacked))
+            nodes, values = _most_central(
+                graph_attacked, centrality_method, weight, k, **options
+            )
+            nodes_attacked.extend(graph_attacked.vs[nodes]["name"])
+            D = _delete_vertices(graph_attacked, D, nodes, weight, n_jobs)
+            measures.append(_lcc_slcc_eff(graph_attacked, weight, D))
+            centrality.extend(values)
+
+        lcc, slcc, eff = (list(x) for x in zip(*measures))
         return graph_attacked, nodes_attacked, lcc, slcc, eff, centrality
 
     def edge_iterative_centrality_attack(
@@ -103,6 +274,9 @@ class NetworkDismantling:
         nattacks=1,
         weight=None,
         centrality_method=lnad.edge_betweenness_centrality,
+        approx=False,
+        n_jobs=None,
+        seed=None,
     ):
         """Carry out iterative targeted attack on edges.
 
@@ -110,6 +284,12 @@ class NetworkDismantling:
             nattacks: Number of attacks to be carried out
             weight: If weight is not none, use weighted centrality and efficiency measures
             centrality_method: Measure used for assessing the centrality of the nodes
+            approx: If approx is true, estimate edge betweenness centrality from a
+                random sample of pivot nodes
+            n_jobs: Number of processes used for updating the shortest paths of large
+                networks (-1 means using all processors)
+            seed: Seed for sampling the pivot nodes if approx is true (by default it
+                is drawn from the random module, as for the random attacks)
 
         Reference:
             Bellingeri, M., Bevacqua, D., Scotognella, F. et al. A comparative analysis of
@@ -120,27 +300,37 @@ class NetworkDismantling:
             nattacks = 1
         if nattacks > self.graph.ecount():
             nattacks = self.graph.ecount()
+        options = {}
+        if approx:
+            if centrality_method is not lnad.edge_betweenness_centrality:
+                raise ValueError(
+                    "approx is only supported for edge betweenness centrality"
+                )
+            centrality_method = lnad.edge_betweenness_centrality_sampled
+            options["seed"] = _pivot_rng(seed)
 
         graph_attacked = self.get_graph()  # work on a local copy of the topology
         edges_attacked = []  # list with coordinates of attacked edges
         centrality = []  # list with centralities of attacked nodes
 
-        lcc = [lnad.largest_connected_component(graph_attacked)]
-        slcc = [lnad.second_largest_connected_component(graph_attacked)]
-        eff = [lnad.global_efficiency(graph_attacked, weight)]
+        # shortest path lengths are cached and updated after each attack
+        D = lnad.distance_matrix(graph_attacked, weight, n_jobs)
+
+        measures = [_lcc_slcc_eff(graph_attacked, weight, D)]
 
         for _ in range(nattacks):
-            bc = centrality_method(graph_attacked, weight)
-            edge = list(bc.keys())[0]
+            [edge], [value] = _most_central(
+                graph_attacked, centrality_method, weight, **options
+            )
+            source, target = graph_attacked.es[edge].tuple
             edges_attacked.append(
-                [graph_attacked.vs[edge.source]["name"], graph_attacked.vs[edge.target]["name"]]
+                [graph_attacked.vs[source]["name"], graph_attacked.vs[target]["name"]]
             )
-            graph_attacked.delete_edges(edge)
-            lcc.append(lnad.largest_connected_component(graph_attacked))
-            slcc.append(lnad.second_largest_connected_component(graph_attacked))
-            eff.append(lnad.global_efficiency(graph_attacked, weight))
-            centrality.append(list(bc.values())[0])
+            D = _delete_edges(graph_attacked, D, [edge], weight, n_jobs)
+            measures.append(_lcc_slcc_eff(graph_attacked, weight, D))
+            centrality.append(value)
 
+        lcc, slcc, eff = (list(x) for x in zip(*measures))
         return graph_attacked, edges_attacked, lcc, slcc, eff, centrality
 
     def articulation_point_targeted_attack(self, nattacks=1, weight=None):
@@ -148,6 +338,10 @@ class NetworkDismantling:
 
         Arguments:
             nattacks: Number of attacks to be carried out
+            weight: If weight is not none, use weighted efficiency measure
+
+        The articulation points are recomputed after each attack, and the attack
+        stops early if the network has no articulation points left.
 
         Reference:
             Tian, L., Bashan, A., Shi, DN. et al. Articulation points in complex networks.
@@ -156,24 +350,23 @@ class NetworkDismantling:
         graph_attacked = self.get_graph()
         nodes_attacked = []  # list with coordinates of attacked nodes
 
-        ap = lnad.articulation_points(graph_attacked)
-
         if nattacks < 1:
             nattacks = 1
         if nattacks > graph_attacked.vcount():
             nattacks = graph_attacked.vcount()
 
-        lcc = [lnad.largest_connected_component(graph_attacked)]
-        slcc = [lnad.second_largest_connected_component(graph_attacked)]
-        eff = [lnad.global_efficiency(graph_attacked)]
-
-        for i in range(nattacks):
-            nodes_attacked.append(ap[i]["name"])
-            graph_attacked.delete_vertices(ap[i])
-            lcc.append(lnad.largest_connected_component(graph_attacked))
-            slcc.append(lnad.second_largest_connected_component(graph_attacked))
-            eff.append(lnad.global_efficiency(graph_attacked, weight))
+        measures = [_lcc_slcc_eff(graph_attacked, weight)]
 
+        for _ in range(nattacks):
+            # removing a node changes the articulation points of its component
+            ap = lnad.articulation_points(graph_attacked)
+            if len(ap) == 0:
+                break
+            nodes_attacked.append(graph_attacked.vs[ap[0]]["name"])
+            graph_attacked.delete_vertices(ap[0])
+            measures.append(_lcc_slcc_eff(graph_attacked, weight))
+
+        lcc, slcc, eff = (list(x) for x in zip(*measures))
         return graph_attacked, nodes_attacked, lcc, slcc, eff
 
     def random_attack(self, nattacks=1, weight=None):
@@ -191,18 +384,15 @@ class NetworkDismantling:
         graph_attacked = self.get_graph()  # work on a local copy of the topology
         nodes_attacked = []  # list with coordinates of attacked nodes
 
-        lcc = [lnad.largest_connected_component(graph_attacked)]
-        slcc = [lnad.second_largest_connected_component(graph_attacked)]
-        eff = [lnad.global_efficiency(graph_attacked, weight)]
+        measures = [_lcc_slcc_eff(graph_attacked, weight)]
 
         for _ in range(nattacks):
-            node = rd.sample(list(graph_attacked.vs), 1)
-            nodes_attacked.append(node[0]["name"])
-            graph_attacked.delete_vertices(node[0])
-            lcc.append(lnad.largest_connected_component(graph_attacked))
-            slcc.append(lnad.second_largest_connected_component(graph_attacked))
-            eff.append(lnad.global_efficiency(graph_attacked, weight))
+            node = rd.randrange(graph_attacked.vcount())
+            nodes_attacked.append(graph_attacked.vs[node]["name"])
+            graph_attacked.delete_vertices(node)
+            measures.append(_lcc_slcc_eff(graph_attacked, weight))
 
+        lcc, slcc, eff = (list(x) for x in zip(*measures))
         return graph_attacked, nodes_attacked, lcc, slcc, eff
 
     def edge_random_attack(self, nattacks=1, weight=None):
@@ -220,21 +410,16 @@ class NetworkDismantling:
         graph_attacked = self.get_graph()  # work on a local copy of the topology
         edges_attacked = []  # list with coordinates of attacked edges
 
-        lcc = [lnad.largest_connected_component(graph_attacked)]
-        slcc = [lnad.second_largest_connected_component(graph_attacked)]
-        eff = [lnad.global_efficiency(graph_attacked, weight)]
+        measures = [_lcc_slcc_eff(graph_attacked, weight)]
 
         for _ in range(nattacks):
-            edge = rd.sample(list(graph_attacked.es), 1)
+            edge = rd.randrange(graph_attacked.ecount())
+            source, target = graph_attacked.es[edge].tuple
             edges_attacked.append(
-                [
-                    graph_attacked.vs[edge[0].source]["name"],
-                    graph_attacked.vs[edge[0].target]["name"],
-                ]
+                [graph_attacked.vs[source]["name"], graph_attacked.vs[target]["name"]]
             )
-            graph_attacked.delete_edges(edge[0])
-            lcc.append(lnad.largest_connected_component(graph_attacked))
-            slcc.append(lnad.second_largest_connected_component(graph_attacked))
-            eff.append(lnad.global_efficiency(graph_attacked, weight))
+            graph_attacked.delete_edges(edge)
+            measures.append(_lcc_slcc_eff(graph_attacked, weight))
 
+        lcc, slcc, eff = (list(x) for x in zip(*measures))
         return graph_attacked, edges_attacked, lcc, slcc, eff
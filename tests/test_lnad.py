@@ -5,10 +5,17 @@
 # and conditions.
 
 import unittest
+import unittest.mock
+import importlib.util
+import tempfile
+import pathlib
+import random
 import networkx as nx
+import numpy as np
 import igraph as ig
 import operator
 import lnad.analysis as lnad
+import lnad.dismantling as dis
 
 
 class TestLNAD(unittest.TestCase):
@@ -20,6 +27,20 @@ class TestLNAD(unittest.TestCase):
         for nx_d, ig_d in zip(nx_deg.values(), ig_deg.values()):
             self.assertAlmostEqual(nx_d, ig_d)
 
+    def test_centrality_values(self):
+        G = nx.karate_club_graph()
+        H = ig.Graph.from_networkx(G)
+        dc = lnad.degree_centrality(H)
+        self.assertIsInstance(dc, np.ndarray)
+        self.assertEqual(dc.dtype, np.float64)
+        for node, d in nx.degree_centrality(G).items():
+            self.assertAlmostEqual(dc[node], d)
+        self.assertEqual(int(dc.argmax()), list(lnad.to_sorted_dict(dc))[0])
+        ebc = lnad.edge_betweenness_centrality(H)
+        self.assertEqual(len(ebc), H.ecount())
+        N = lnad.NetworkAnalysis(H)
+        self.assertEqual(lnad.to_sorted_dict(ebc), N.edge_betweenness_centrality())
+
     def test_eigenvector_centrality(self):
         G = nx.Graph([(0, 1), (0, 2), (0, 3), (1, 2), (1, 3)])
         N = lnad.NetworkAnalysis(ig.Graph.from_networkx(G))
@@ -38,6 +59,22 @@ class TestLNAD(unittest.TestCase):
         for nx_d, ig_d in zip(nx_deg.values(), ig_deg.values()):
             self.assertAlmostEqual(nx_d, ig_d)
 
+    def test_betweenness_centrality_sampled(self):
+        G = nx.karate_club_graph()
+        N = lnad.NetworkAnalysis(ig.Graph.from_networkx(G))
+        ig_deg = N.betweenness_centrality()
+        ig_est = N.betweenness_centrality_sampled(k=G.number_of_nodes())
+        for ig_d, ig_e in zip(ig_deg.values(), ig_est.values()):
+            self.assertAlmostEqual(ig_d, ig_e)
+        ig_est = N.betweenness_centrality_sampled(k=10, seed=1)
+        self.assertEqual(len(ig_est), G.number_of_nodes())
+        # the extrapolation from the pivots is unbiased
+        H = ig.Graph.from_networkx(G)
+        bc = [lnad.betweenness_centrality_sampled(H, k=10, seed=s) for s in range(2000)]
+        np.testing.assert_allclose(
+            np.mean(bc, axis=0), lnad.betweenness_centrality(H), atol=0.01
+        )
+
     def test_edge_betweenness_centrality(self):
         G = nx.Graph([(0, 1), (0, 2), (0, 3), (1, 2), (1, 3)])
         N = lnad.NetworkAnalysis(ig.Graph.from_networkx(G))
@@ -47,6 +84,36 @@ class TestLNAD(unittest.TestCase):
         for nx_d, ig_d in zip(nx_deg.values(), ig_deg.values()):
             self.assertAlmostEqual(nx_d, ig_d)
 
+    def test_betweenness_centrality_normalize(self):
+        G = ig.Graph.from_networkx(nx.karate_club_graph())
+        bc = lnad.betweenness_centrality(G)
+        bc_raw = lnad.betweenness_centrality(G, normalize=False)
+        np.testing.assert_allclose(bc, bc_raw * lnad._betweenness_normalization(G))
+        bc = lnad.edge_betweenness_centrality(G)
+        bc_raw = lnad.edge_betweenness_centrality(G, normalize=False)
+        np.testing.assert_allclose(
+            bc, bc_raw * lnad._edge_betweenness_normalization(G)
+        )
+
+    def test_edge_betweenness_centrality_sampled(self):
+        G = nx.karate_club_graph()
+        N = lnad.NetworkAnalysis(ig.Graph.from_networkx(G))
+        ig_deg = N.edge_betweenness_centrality()
+        ig_est = N.edge_betweenness_centrality_sampled(k=G.number_of_nodes())
+        for ig_d, ig_e in zip(ig_deg.values(), ig_est.values()):
+            self.assertAlmostEqual(ig_d, ig_e)
+        ig_est = N.edge_betweenness_centrality_sampled(k=10, seed=1)
+        self.assertEqual(len(ig_est), G.number_of_edges())
+        # the extrapolation from the pivots is unbiased
+        H = ig.Graph.from_networkx(G)
+        bc = [
+            lnad.edge_betweenness_centrality_sampled(H, k=10, seed=s)
+            for s in range(2000)
+        ]
+        np.testing.assert_allclose(
+            np.mean(bc, axis=0), lnad.edge_betweenness_centrality(H), atol=0.01
+        )
+
     def test_closeness_centrality(self):
         G = nx.Graph([(0, 1), (0, 2), (0, 3), (1, 2), (1, 3)])
         N = lnad.NetworkAnalysis(ig.Graph.from_networkx(G))
@@ -65,6 +132,39 @@ class TestLNAD(unittest.TestCase):
         for nx_d, ig_d in zip(nx_deg.values(), ig_deg.values()):
             self.assertAlmostEqual(nx_d, ig_d, places=6)
 
+    def test_pagerank_weighted(self):
+        G = nx.karate_club_graph()
+        N = lnad.NetworkAnalysis(ig.Graph.from_networkx(G))
+        nx_pr = nx.pagerank(G, weight="weight", tol=1e-12)
+        ig_pr = N.pagerank(weight="weight")
+        for node, d in nx_pr.items():
+            self.assertAlmostEqual(d, ig_pr[node], places=6)
+        self.assertNotAlmostEqual(ig_pr[0], N.pagerank()[0], places=6)
+
+    @unittest.skipIf(
+        importlib.util.find_spec("networkit") is None, "networkit is not installed"
+    )
+    def test_networkit_backend(self):
+        for G in attack_graphs():
+            G.add_vertices(2)  # isolated nodes
+            N = lnad.NetworkAnalysis(G)
+            Nk = lnad.NetworkAnalysis(G, backend="networkit")
+            for method, weight in [
+                ("betweenness_centrality", None),
+                ("betweenness_centrality", "weight"),
+                ("closeness_centrality", None),
+                ("closeness_centrality", "weight"),
+                ("pagerank", None),
+                ("pagerank", "weight"),
+            ]:
+                c = getattr(N, method)(weight)
+                ck = getattr(Nk, method)(weight)
+                np.testing.assert_allclose(
+                    [ck[idx] for idx in c], list(c.values()), atol=1e-10
+                )
+        with self.assertRaises(ValueError):
+            lnad.NetworkAnalysis(G, backend="graph-tool")
+
     def test_global_effectivness(self):
         G = nx.Graph([(0, 1), (0, 2), (0, 3), (1, 2), (1, 3)])
         N = lnad.NetworkAnalysis(ig.Graph.from_networkx(G))
@@ -72,6 +172,35 @@ class TestLNAD(unittest.TestCase):
         ig_eff = N.global_efficiency()
         self.assertAlmostEqual(nx_eff, ig_eff)
 
+    def test_global_efficiency_disconnected(self):
+        G = nx.Graph([(0, 1), (0, 2), (1, 2), (3, 4), (4, 5)])
+        N = lnad.NetworkAnalysis(ig.Graph.from_networkx(G))
+        nx_eff = nx.global_efficiency(G)
+        ig_eff = N.global_efficiency()
+        self.assertAlmostEqual(nx_eff, ig_eff)
+
+    def test_global_efficiency_parallel(self):
+        G = nx.gnm_random_graph(600, 1200, seed=1)
+        N = lnad.NetworkAnalysis(ig.Graph.from_networkx(G))
+        # the serial call runs the numba kernel (if available) before the pool starts
+        eff = N.global_efficiency()
+        with unittest.mock.patch.object(lnad, "_PARALLEL_MIN_WORK", 0):
+            self.assertAlmostEqual(eff, N.global_efficiency(n_jobs=2))
+        # the pool is kept, hence the small network is also computed in parallel
+        self.assertEqual(lnad._process_pool[0], 2)
+        self.assertAlmostEqual(nx.global_efficiency(G), N.global_efficiency(n_jobs=2))
+        H = ig.Graph.from_networkx(G)
+        sources = list(range(100, 400))
+        np.testing.assert_array_equal(
+            lnad.distance_matrix(H, sources=sources),
+            lnad.distance_matrix(H, n_jobs=2, sources=sources),
+        )
+
+    def test_inverse_distance_sum(self):
+        D = np.array([[0, 1, np.inf], [1, 0, 2], [np.inf, 4, 0]])
+        for dtype in [np.float32, np.float64]:
+            self.assertAlmostEqual(lnad._inverse_distance_sum(D.astype(dtype)), 2.75)
+
     def test_largest_connected_component(self):
         G = nx.Graph([(0, 1), (0, 2), (0, 3), (1, 2), (1, 3)])
         N = lnad.NetworkAnalysis(ig.Graph.from_networkx(G))
@@ -79,6 +208,264 @@ class TestLNAD(unittest.TestCase):
         ig_lcc = N.largest_connected_component()
         self.assertEqual(nx_lcc, ig_lcc)
 
+    def test_read_edgelist(self):
+        G = nx.karate_club_graph()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = pathlib.Path(tmpdir) / "karate.txt"
+            nx.write_edgelist(G, filename, data=["weight"])
+            N = lnad.NetworkAnalysis()
+            N.read_edgelist(filename, data=[("weight", float)])
+        self.assertEqual(G.number_of_edges(), N.graph.ecount())
+        self.assertAlmostEqual(nx.global_efficiency(G), N.global_efficiency())
+        self.assertEqual(
+            G[0][1]["weight"], N.graph.es[N.graph.get_eid("0", "1")]["weight"]
+        )
+
+    def test_read_edgelist_nodetype(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = pathlib.Path(tmpdir) / "edges.txt"
+            filename.write_text("1 2 0.5\n2 3 1.5\n10 1 2.0\n")
+            G = nx.read_edgelist(filename, nodetype=int, data=[("weight", float)])
+            N = lnad.NetworkAnalysis()
+            N.read_edgelist(filename, nodetype=int, data=[("weight", float)])
+        self.assertEqual(N.graph.vs["name"], list(G.nodes))
+        self.assertTrue(all(type(name) is int for name in N.graph.vs["name"]))
+        for u, v, w in G.edges(data="weight"):
+            eid = N.graph.get_eid(N.graph.vs.find(name=u), N.graph.vs.find(name=v))
+            self.assertEqual(w, N.graph.es[eid]["weight"])
+
+    def test_read_adjacency(self):
+        G = nx.karate_club_graph()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = pathlib.Path(tmpdir) / "karate.csv"
+            nx.to_pandas_adjacency(G).to_csv(filename)
+            N = lnad.NetworkAnalysis()
+            N.read_adjacency(filename)
+            filename = pathlib.Path(tmpdir) / "karate_labelled.csv"
+            nx.to_pandas_adjacency(G).rename_axis("node").to_csv(filename)
+            M = lnad.NetworkAnalysis()
+            M.read_adjacency(filename, index_col="node")
+            with self.assertRaises(ValueError):
+                M.read_adjacency(filename, index_col="name")
+        self.assertEqual(G.number_of_edges(), N.graph.ecount())
+        self.assertAlmostEqual(nx.global_efficiency(G), N.global_efficiency())
+        self.assertEqual(N.graph.vs["name"], M.graph.vs["name"])
+        self.assertEqual(N.graph.get_edgelist(), M.graph.get_edgelist())
+
+
+def attack_graphs():
+    """Return undirected and directed weighted test graphs with named nodes."""
+    G = ig.Graph.from_networkx(nx.karate_club_graph())
+    G.vs["name"] = [str(v) for v in G.vs["_nx_name"]]
+    H = ig.Graph.from_networkx(nx.gnm_random_graph(30, 60, directed=True, seed=1))
+    H.vs["name"] = [str(v) for v in H.vs["_nx_name"]]
+    H.es["weight"] = [1.0 + (e.index % 3) for e in H.es]
+    return [G, H]
+
+
+class TestDismantling(unittest.TestCase):
+    def assertMeasures(self, H, lcc, slcc, eff, weight):
+        self.assertEqual(lcc, lnad.largest_connected_component(H))
+        self.assertEqual(slcc, lnad.second_largest_connected_component(H))
+        self.assertAlmostEqual(eff, lnad.global_efficiency(H, weight))
+
+    def test_node_iterative_centrality_attack(self):
+        G = ig.Graph.from_networkx(nx.karate_club_graph())
+        G.vs["name"] = G.vs["_nx_name"]
+        D = dis.NetworkDismantling(G)
+        for weight in [None, "weight"]:
+            _, nodes, _, _, eff, _ = D.node_iterative_centrality_attack(
+                nattacks=5, weight=weight
+            )
+            H = G.copy()
+            for node, eff_attacked in zip(nodes, eff[1:]):
+                H.delete_vertices(H.vs.find(name=node))
+                self.assertAlmostEqual(eff_attacked, lnad.global_efficiency(H, weight))
+
+    def test_iterative_centrality_attack_parallel(self):
+        G = ig.Graph.from_networkx(nx.gnm_random_graph(300, 600, seed=1))
+        G.vs["name"] = [str(v) for v in G.vs["_nx_name"]]
+        D = dis.NetworkDismantling(G)
+        with unittest.mock.patch.multiple(
+            lnad, _PARALLEL_MIN_SOURCES=0, _PARALLEL_MIN_WORK=0
+        ):
+            for attack in [
+                D.node_iterative_centrality_attack,
+                D.edge_iterative_centrality_attack,
+            ]:
+                _, attacked, lcc, slcc, eff, _ = attack(nattacks=3, n_jobs=2)
+                self.assertEqual(
+                    (attacked, lcc, slcc, eff), tuple(attack(nattacks=3)[1:5])
+                )
+
+    def test_node_iterative_centrality_attack_centrality(self):
+        G = attack_graphs()[0]
+        D = dis.NetworkDismantling(G)
+        _, nodes, _, _, _, centrality = D.node_iterative_centrality_attack(nattacks=3)
+        H = G.copy()
+        for node, value in zip(nodes, centrality):
+            idx = H.vs.find(name=node).index
+            self.assertAlmostEqual(value, lnad.betweenness_centrality(H)[idx])
+            self.assertAlmostEqual(value, lnad.betweenness_centrality(H).max())
+            H.delete_vertices(idx)
+
+    def test_node_iterative_centrality_attack_approx(self):
+        G = ig.Graph.from_networkx(nx.gnm_random_graph(100, 200, seed=1))
+        G.vs["name"] = [str(v) for v in G.vs["_nx_name"]]
+        D = dis.NetworkDismantling(G)
+        _, nodes, lcc, slcc, eff, centrality = D.node_iterative_centrality_attack(
+            nattacks=5, approx=True, seed=1
+        )
+        # the pivots of the first step are drawn from a generator seeded with seed
+        bc = lnad.betweenness_centrality_sampled(G, seed=np.random.default_rng(1))
+        self.assertAlmostEqual(centrality[0], bc.max())
+        self.assertEqual(
+            nodes, D.node_iterative_centrality_attack(5, approx=True, seed=1)[1]
+        )
+        random.seed(1)
+        nodes_random = D.node_iterative_centrality_attack(5, approx=True)[1]
+        random.seed(1)
+        self.assertEqual(
+            nodes_random, D.node_iterative_centrality_attack(5, approx=True)[1]
+        )
+        H = G.copy()
+        for i, node in enumerate(nodes):
+            H.delete_vertices(H.vs.find(name=node))
+            self.assertMeasures(H, lcc[i + 1], slcc[i + 1], eff[i + 1], None)
+        with self.assertRaises(ValueError):
+            D.node_iterative_centrality_attack(
+                approx=True, centrality_method=lnad.degree_centrality
+            )
+
+    def test_node_iterative_centrality_attack_batch(self):
+        G = ig.Graph.Lattice([6, 6], circular=False)  # degree centralities tie
+        G.vs["name"] = [str(v.index) for v in G.vs]
+        for G in [attack_graphs()[0], G]:
+            D = dis.NetworkDismantling(G)
+            _, nodes, lcc, slcc, eff, centrality = D.node_iterative_centrality_attack(
+                nattacks=7, centrality_method=lnad.degree_centrality, batch_size=3
+            )
+            self.assertEqual(len(nodes), 7)
+            self.assertEqual(len(centrality), 7)
+            self.assertEqual(len(eff), 4)  # batches of 3, 3 and 1 nodes
+            H = G.copy()
+            for i, batch in enumerate([nodes[:3], nodes[3:6], nodes[6:]]):
+                dc = lnad.to_sorted_dict(lnad.degree_centrality(H))
+                top = list(dc)[: len(batch)]
+                self.assertEqual(batch, H.vs[top]["name"])
+                H.delete_vertices(top)
+                self.assertMeasures(H, lcc[i + 1], slcc[i + 1], eff[i + 1], None)
+
+    def test_top_centralities_ties(self):
+        rng = np.random.default_rng(1)
+        for _ in range(200):
+            values = rng.integers(0, 4, size=22).astype(float)
+            ranked = lnad.to_sorted_dict(values)
+            for k in [1, 5, 12, 22]:
+                idx, top = dis._top_centralities(values, k)
+                self.assertEqual(idx, list(ranked)[:k])
+                self.assertEqual(top, list(ranked.values())[:k])
+
+    def test_edge_iterative_centrality_attack(self):
+        G = ig.Graph.from_networkx(nx.karate_club_graph())
+        G.vs["name"] = G.vs["_nx_name"]
+        D = dis.NetworkDismantling(G)
+        for weight in [None, "weight"]:
+            _, edges, _, _, eff, _ = D.edge_iterative_centrality_attack(
+                nattacks=5, weight=weight
+            )
+            H = G.copy()
+            for edge, eff_attacked in zip(edges, eff[1:]):
+                H.delete_edges(H.get_eid(*edge))
+                self.assertAlmostEqual(eff_attacked, lnad.global_efficiency(H, weight))
+
+    def test_articulation_point_targeted_attack(self):
+        for G in attack_graphs():
+            D = dis.NetworkDismantling(G)
+            _, nodes, lcc, slcc, eff = D.articulation_point_targeted_attack(
+                nattacks=G.vcount(), weight="weight"
+            )
+            self.assertEqual(len(lcc), len(nodes) + 1)
+            H = G.copy()
+            self.assertMeasures(H, lcc[0], slcc[0], eff[0], "weight")
+            for i, node in enumerate(nodes):
+                self.assertIn(H.vs.find(name=node).index, H.articulation_points())
+                H.delete_vertices(H.vs.find(name=node))
+                self.assertMeasures(H, lcc[i + 1], slcc[i + 1], eff[i + 1], "weight")
+            self.assertEqual(len(H.articulation_points()), 0)
+
+    def test_random_attack(self):
+        for G in attack_graphs():
+            D = dis.NetworkDismantling(G)
+            for weight in [None, "weight"]:
+                random.seed(1)
+                _, nodes, lcc, slcc, eff = D.random_attack(nattacks=10, weight=weight)
+                H = G.copy()
+                self.assertMeasures(H, lcc[0], slcc[0], eff[0], weight)
+                for i, node in enumerate(nodes):
+                    H.delete_vertices(H.vs.find(name=node))
+                    self.assertMeasures(H, lcc[i + 1], slcc[i + 1], eff[i + 1], weight)
+
+    def test_edge_random_attack(self):
+        for G in attack_graphs():
+            D = dis.NetworkDismantling(G)
+            for weight in [None, "weight"]:
+                random.seed(1)
+                _, edges, lcc, slcc, eff = D.edge_random_attack(
+                    nattacks=10, weight=weight
+                )
+                H = G.copy()
+                self.assertMeasures(H, lcc[0], slcc[0], eff[0], weight)
+                for i, edge in enumerate(edges):
+                    H.delete_edges(H.get_eid(*edge))
+                    self.assertMeasures(H, lcc[i + 1], slcc[i + 1], eff[i + 1], weight)
+
+    def test_edge_iterative_centrality_attack_approx(self):
+        G = ig.Graph.from_networkx(nx.gnm_random_graph(100, 200, seed=1))
+        G.vs["name"] = [str(v) for v in G.vs["_nx_name"]]
+        D = dis.NetworkDismantling(G)
+        _, edges, lcc, slcc, eff, centrality = D.edge_iterative_centrality_attack(
+            nattacks=5, approx=True, seed=1
+        )
+        # the pivots of the first step are drawn from a generator seeded with seed
+        bc = lnad.edge_betweenness_centrality_sampled(
+            G, seed=np.random.default_rng(1)
+        )
+        self.assertAlmostEqual(centrality[0], bc.max())
+        self.assertEqual(
+            edges, D.edge_iterative_centrality_attack(5, approx=True, seed=1)[1]
+        )
+        random.seed(1)
+        edges_random = D.edge_iterative_centrality_attack(5, approx=True)[1]
+        random.seed(1)
+        self.assertEqual(
+            edges_random, D.edge_iterative_centrality_attack(5, approx=True)[1]
+        )
+        self.assertEqual(len(eff), 6)
+        H = G.copy()
+        for i, edge in enumerate(edges):
+            H.delete_edges(H.get_eid(*edge))
+            self.assertMeasures(H, lcc[i + 1], slcc[i + 1], eff[i + 1], None)
+        with self.assertRaises(ValueError):
+            D.edge_iterative_centrality_attack(
+                approx=True, centrality_method=lnad.betweenness_centrality
+            )
+
+    def test_random_attack_sampling(self):
+        G = attack_graphs()[0]
+        D = dis.NetworkDismantling(G)
+        random.seed(2)
+        _, nodes, lcc, _, _ = D.random_attack(nattacks=20)
+        self.assertEqual(len(set(nodes)), 20)
+        self.assertTrue(set(nodes) <= set(G.vs["name"]))
+        self.assertEqual(len(lcc), 21)
+        random.seed(2)
+        _, edges, lcc, _, _ = D.edge_random_attack(nattacks=20)
+        self.assertEqual(len(set(map(tuple, edges))), 20)
+        for edge in edges:
+            self.assertNotEqual(G.get_eid(*edge, error=False), -1)
+        self.assertEqual(len(lcc), 21)
+
 
 if __name__ == "__main__":
     unittest.main()